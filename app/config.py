@@ -1,26 +1,71 @@
-from pydantic_settings import BaseSettings
+from dataclasses import MISSING, dataclass, fields
+from dotenv import load_dotenv
 from typing import Optional
+import os
 
+load_dotenv()
 
-class Settings(BaseSettings):
+
+def _parse_env(value: str, field_type):
+    """Convert an environment variable string to a field's type."""
+    if field_type is bool:
+        return value.strip().lower() in ("1", "true", "yes", "on")
+    if field_type in (int, float):
+        return field_type(value)
+    return value
+
+
+@dataclass(frozen=True, slots=True, kw_only=True)
+class Settings:
     """Application settings loaded from environment variables."""
-    
+
     # Pinecone Configuration
     pinecone_api_key: str
     pinecone_index_name: str = "rag-index"
     pinecone_environment: Optional[str] = None
-    
+
+    # Vector store backend: "pinecone" or "local" (in-process FAISS)
+    backend: str = "pinecone"
+    local_index_path: str = "data/local_index.faiss"
+
     # OpenAI Configuration
     openai_api_key: str
-    
+    openai_model: str = "gpt-3.5-turbo"
+    embedding_model: str = "text-embedding-3-small"
+    embedding_dimension: int = 1536  # text-embedding-3-small dimension
+
+    # Document Processing Configuration
+    chunk_by_tokens: bool = False  # Measure chunk size in tokens instead of characters
+
+    # Embedding Cache Configuration
+    embedding_cache_path: str = "data/embedding_cache.sqlite3"
+
+    # Semantic Cache Configuration
+    semantic_cache_threshold: float = 0.40  # question to source chunk
+    semantic_cache_question_threshold: float = 0.90  # question to cached question
+    semantic_cache_ttl: int = 300  # seconds
+    semantic_cache_max_size: int = 1000
+
     # Application Configuration
     api_port: int = 8000
     environment: str = "development"
-    
-    class Config:
-        env_file = ".env"
-        case_sensitive = False
-        extra = "ignore"  # Ignore extra environment variables that aren't defined in the model
+
+    @classmethod
+    def from_env(cls) -> "Settings":
+        """
+        Build settings from environment variables named after each field in upper case.
+
+        Raises:
+            KeyError: If a required variable is not set
+        """
+        values = {}
+        for field in fields(cls):
+            name = field.name.upper()
+            if name in os.environ:
+                values[field.name] = _parse_env(os.environ[name], field.type)
+            elif field.default is MISSING:
+                raise KeyError(f"Missing required environment variable: {name}")
+        return cls(**values)
 
 
-settings = Settings()
+settings = Settings.from_env()
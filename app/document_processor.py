@@ -1,10 +1,33 @@
-from langchain_text_splitters import RecursiveCharacterTextSplitter
+from semantic_text_splitter import TextSplitter
 from langchain_core.documents import Document
 from typing import List
+import functools
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Model whose tokenizer measures token-based chunks (cl100k_base, shared with
+# text-embedding-3-small)
+TOKENIZER_MODEL = "gpt-3.5-turbo"
+
+
+@functools.cache
+def _get_splitter(chunk_size: int, chunk_overlap: int, by_tokens: bool) -> TextSplitter:
+    """
+    Build a splitter once per configuration and share it across processors.
+    
+    Splitters are immutable, so one instance can serve concurrent requests;
+    this also means the BPE ranks for token-based splitting load only once.
+    """
+    capacity = (chunk_size - chunk_overlap, chunk_size)
+    if by_tokens:
+        return TextSplitter.from_tiktoken_model(
+            TOKENIZER_MODEL,
+            capacity=capacity,
+            overlap=chunk_overlap
+        )
+    return TextSplitter(capacity=capacity, overlap=chunk_overlap)
+
 
 class DocumentProcessor:
     """Handles document chunking and processing."""
@@ -12,14 +35,12 @@ class DocumentProcessor:
     def __init__(
         self,
         chunk_size: int = 1000,
-        chunk_overlap: int = 200
+        chunk_overlap: int = 200,
+        by_tokens: bool = False
     ):
-        self.text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=chunk_size,
-            chunk_overlap=chunk_overlap,
-            length_function=len,
-            separators=["\n\n", "\n", " ", ""]
-        )
+        # Rust-backed splitter: fills each chunk up to chunk_size characters
+        # (or tokens), preferring paragraph, then line, sentence and word boundaries
+        self.text_splitter = _get_splitter(chunk_size, chunk_overlap, by_tokens)
     
     def process_text(self, text: str, metadata: dict = None) -> List[Document]:
         """
@@ -36,7 +57,10 @@ class DocumentProcessor:
             metadata = {}
         
         # Split text into chunks
-        chunks = self.text_splitter.create_documents([text], [metadata])
+        chunks = [
+            Document(page_content=chunk, metadata=dict(metadata))
+            for chunk in self.text_splitter.chunks(text)
+        ]
         
         logger.info(f"Processed text into {len(chunks)} chunks")
         return chunks
@@ -55,10 +79,15 @@ class DocumentProcessor:
         if metadatas is None:
             metadatas = [{}] * len(documents)
         
-        all_chunks = []
-        for doc_text, metadata in zip(documents, metadatas):
-            chunks = self.process_text(doc_text, metadata)
-            all_chunks.extend(chunks)
+        # Split every document in one call, which the splitter parallelizes
+        # across documents in Rust. This still blocks the caller until done,
+        # so async callers should run it in a worker thread
+        all_chunks = [
+            Document(page_content=chunk, metadata=dict(metadata or {}))
+            for chunks, metadata in zip(self.text_splitter.chunk_all(documents), metadatas)
+            for chunk in chunks
+        ]
         
+        logger.info(f"Processed {len(documents)} documents into {len(all_chunks)} chunks")
         return all_chunks
 
@@ -0,0 +1,89 @@
+import hashlib
+import numpy as np
+import os
+import sqlite3
+import threading
+from typing import Dict, List
+from app.config import settings
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Stay under SQLite's default limit on bound parameters per statement
+SELECT_BATCH_SIZE = 900
+
+
+class EmbeddingCache:
+    """
+    Persistent cache of chunk embeddings keyed by the SHA-256 of their content.
+
+    Embeddings are stored as float16 to halve the on-disk size.
+    """
+
+    def __init__(
+        self,
+        path: str = settings.embedding_cache_path,
+        model: str = settings.embedding_model
+    ):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.model = model
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            """CREATE TABLE IF NOT EXISTS embeddings (
+                content_sha256 BLOB NOT NULL,
+                model TEXT NOT NULL,
+                vec BLOB NOT NULL,
+                PRIMARY KEY (content_sha256, model)
+            )"""
+        )
+        self.conn.commit()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def content_hash(text: str) -> bytes:
+        """Return the SHA-256 digest of a chunk's content."""
+        return hashlib.sha256(text.encode()).digest()
+
+    def get_many(self, hashes: List[bytes]) -> Dict[bytes, List[float]]:
+        """
+        Fetch cached embeddings.
+
+        Args:
+            hashes: Content hashes to look up
+
+        Returns:
+            Mapping of content hash to embedding for every hash found
+        """
+        found = {}
+        with self._lock:
+            for i in range(0, len(hashes), SELECT_BATCH_SIZE):
+                batch = hashes[i:i + SELECT_BATCH_SIZE]
+                placeholders = ",".join("?" * len(batch))
+                rows = self.conn.execute(
+                    f"SELECT content_sha256, vec FROM embeddings "
+                    f"WHERE model = ? AND content_sha256 IN ({placeholders})",
+                    [self.model, *batch]
+                )
+                for content_sha256, vec in rows:
+                    found[content_sha256] = np.frombuffer(vec, dtype=np.float16).astype(np.float32).tolist()
+        return found
+
+    def put_many(self, embeddings: Dict[bytes, List[float]]):
+        """
+        Store embeddings, keeping any already cached for the same content.
+
+        Args:
+            embeddings: Mapping of content hash to embedding
+        """
+        with self._lock:
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO embeddings (content_sha256, model, vec) VALUES (?, ?, ?)",
+                [
+                    (content_sha256, self.model, np.asarray(embedding, dtype=np.float16).tobytes())
+                    for content_sha256, embedding in embeddings.items()
+                ]
+            )
+            self.conn.commit()
@@ -0,0 +1,175 @@
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.vectorstores import VectorStore
+from typing import Any, Iterable, List, Optional
+from app.openai_client import embedding_batches, get_openai_client
+from app.config import settings
+import faiss
+import json
+import numpy as np
+import os
+import threading
+import logging
+
+logger = logging.getLogger(__name__)
+
+# HNSW graph parameters
+HNSW_M = 32
+HNSW_EF_CONSTRUCTION = 200
+HNSW_EF_SEARCH = 64
+
+
+class LocalVectorStore(VectorStore):
+    """In-process FAISS HNSW vector store for small collections."""
+
+    def __init__(
+        self,
+        dimension: int = settings.embedding_dimension,
+        index_path: str = settings.local_index_path
+    ):
+        self.dimension = dimension
+        self.index_path = index_path
+        self.index = self._create_index()
+        self.docs: List[Document] = []
+        self._lock = threading.Lock()
+
+    def _create_index(self):
+        # Store vectors as fp16 to halve memory and bandwidth per distance computation
+        index = faiss.IndexHNSWSQ(
+            self.dimension,
+            faiss.ScalarQuantizer.QT_fp16,
+            HNSW_M,
+            faiss.METRIC_INNER_PRODUCT
+        )
+        index.hnsw.efConstruction = HNSW_EF_CONSTRUCTION
+        index.hnsw.efSearch = HNSW_EF_SEARCH
+        return index
+
+    def _normalize(self, embeddings: List[List[float]]) -> np.ndarray:
+        vectors = np.asarray(embeddings, dtype=np.float32).reshape(-1, self.dimension)
+        faiss.normalize_L2(vectors)
+        return vectors
+
+    @property
+    def docs_path(self) -> str:
+        return f"{self.index_path}.docs.json"
+
+    def add_embeddings(
+        self,
+        documents: List[Document],
+        embeddings: List[List[float]]
+    ) -> List[str]:
+        """
+        Add documents with precomputed embeddings.
+
+        Args:
+            documents: Documents to store
+            embeddings: Embedding vector for each document
+
+        Returns:
+            List of IDs of the added documents
+        """
+        vectors = self._normalize(embeddings)
+        with self._lock:
+            start = len(self.docs)
+            self.index.add(vectors)
+            self.docs.extend(documents)
+        return [str(i) for i in range(start, start + len(documents))]
+
+    def add_documents(self, documents: List[Document], **kwargs: Any) -> List[str]:
+        """
+        Embed and add documents to the index.
+
+        Args:
+            documents: Documents to store
+
+        Returns:
+            List of IDs of the added documents
+        """
+        texts = [doc.page_content for doc in documents]
+        embeddings = []
+        for batch in embedding_batches(texts):
+            embeddings.extend(get_openai_client().create_embeddings(texts[batch]))
+        return self.add_embeddings(documents, embeddings)
+
+    def add_texts(
+        self,
+        texts: Iterable[str],
+        metadatas: Optional[List[dict]] = None,
+        **kwargs: Any
+    ) -> List[str]:
+        texts = list(texts)
+        if metadatas is None:
+            metadatas = [{}] * len(texts)
+        return self.add_documents([
+            Document(page_content=text, metadata=dict(metadata))
+            for text, metadata in zip(texts, metadatas)
+        ])
+
+    def similarity_search(self, query: str, k: int = 4, **kwargs: Any) -> List[Document]:
+        return self.similarity_search_by_vector(get_openai_client().create_embedding(query), k)
+
+    async def asimilarity_search(self, query: str, k: int = 4, **kwargs: Any) -> List[Document]:
+        embedding = await get_openai_client().acreate_embedding(query)
+        return self.similarity_search_by_vector(embedding, k)
+
+    def similarity_search_by_vector(
+        self,
+        embedding: List[float],
+        k: int = 4,
+        **kwargs: Any
+    ) -> List[Document]:
+        with self._lock:
+            if self.index.ntotal == 0:
+                return []
+            _, ids = self.index.search(self._normalize([embedding]), k)
+            return [self.docs[i] for i in ids[0] if i != -1]
+
+    async def asimilarity_search_by_vector(
+        self,
+        embedding: List[float],
+        k: int = 4,
+        **kwargs: Any
+    ) -> List[Document]:
+        # In-process search is fast enough not to need an executor thread
+        return self.similarity_search_by_vector(embedding, k)
+
+    @classmethod
+    def from_texts(
+        cls,
+        texts: List[str],
+        embedding: Embeddings,
+        metadatas: Optional[List[dict]] = None,
+        **kwargs: Any
+    ) -> "LocalVectorStore":
+        store = cls(**kwargs)
+        store.add_texts(texts, metadatas)
+        return store
+
+    def load(self):
+        """Load a previously saved index from disk, if one exists."""
+        if not os.path.exists(self.index_path):
+            return
+        with self._lock:
+            self.index = faiss.read_index(self.index_path)
+            self.index.hnsw.efSearch = HNSW_EF_SEARCH
+            with open(self.docs_path) as f:
+                self.docs = [
+                    Document(page_content=doc["page_content"], metadata=doc["metadata"])
+                    for doc in json.load(f)
+                ]
+        logger.info(f"Loaded {len(self.docs)} documents from {self.index_path}")
+
+    def save(self):
+        """Persist the index and documents to disk."""
+        directory = os.path.dirname(self.index_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._lock:
+            faiss.write_index(self.index, self.index_path)
+            with open(self.docs_path, "w") as f:
+                json.dump(
+                    [{"page_content": doc.page_content, "metadata": doc.metadata} for doc in self.docs],
+                    f
+                )
+        logger.info(f"Saved {len(self.docs)} documents to {self.index_path}")
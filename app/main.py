@@ -1,11 +1,15 @@
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, ORJSONResponse, StreamingResponse
 from pydantic import BaseModel
 from typing import Optional, List
+import asyncio
 import logging
-from app.rag_service import rag_service
+import orjson
+from app.rag_service import get_rag_service
+from app.pinecone_client import get_pinecone_manager
+from app.openai_client import get_openai_client
 from app.config import settings
 import os
 
@@ -17,7 +21,8 @@ logger = logging.getLogger(__name__)
 app = FastAPI(
     title="RAG Pinecone API",
     description="Retrieval-Augmented Generation API using Pinecone and OpenAI",
-    version="1.0.0"
+    version="1.0.0",
+    default_response_class=ORJSONResponse
 )
 
 # Add CORS middleware
@@ -41,6 +46,10 @@ class DocumentRequest(BaseModel):
     metadata: Optional[dict] = None
 
 
+class BulkDocumentRequest(BaseModel):
+    documents: List[DocumentRequest]
+
+
 class QueryRequest(BaseModel):
     question: str
 
@@ -60,7 +69,7 @@ async def startup_event():
     """Initialize services on startup."""
     try:
         logger.info("Initializing RAG service...")
-        rag_service.initialize()
+        get_rag_service().initialize()
         logger.info("RAG service initialized successfully")
     except Exception as e:
         logger.error(f"Error during startup: {str(e)}")
@@ -68,6 +77,19 @@ async def startup_event():
         logger.warning("Server starting without RAG initialization. Please check API keys.")
 
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Persist local state and release connections on shutdown."""
+    try:
+        # Skip services that were never created
+        if get_pinecone_manager.cache_info().currsize:
+            get_pinecone_manager().shutdown()
+        if get_openai_client.cache_info().currsize:
+            await get_openai_client().aclose()
+    except Exception as e:
+        logger.error(f"Error during shutdown: {str(e)}")
+
+
 @app.get("/")
 async def root():
     """Serve the web UI."""
@@ -91,11 +113,11 @@ async def health():
 async def get_stats():
     """Debug endpoint to check document count."""
     try:
-        doc_count = rag_service.get_document_count()
+        rag_service = get_rag_service()
+        doc_count = await asyncio.to_thread(rag_service.get_document_count)
         return {
             "document_count": doc_count,
-            "vector_store_initialized": rag_service.vector_store is not None,
-            "retriever_initialized": rag_service.retriever is not None
+            "vector_store_initialized": rag_service.vector_store is not None
         }
     except Exception as e:
         logger.error(f"Error getting stats: {str(e)}")
@@ -111,13 +133,33 @@ async def add_document(request: DocumentRequest):
     - **metadata**: Optional metadata dictionary
     """
     try:
-        result = rag_service.add_documents(request.text, request.metadata)
+        result = await get_rag_service().aadd_documents(request.text, request.metadata)
         return DocumentResponse(**result)
     except Exception as e:
         logger.error(f"Error adding document: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.post("/documents/bulk", response_model=DocumentResponse)
+async def add_documents_bulk(request: BulkDocumentRequest):
+    """
+    Add many documents to the vector store in batched upserts.
+    
+    - **documents**: List of documents, each with text and optional metadata
+    """
+    try:
+        async with get_rag_service().buffered_ingestion() as ingester:
+            await ingester.try_ingest_many(
+                [document.text for document in request.documents],
+                [document.metadata for document in request.documents]
+            )
+        status = "success" if ingester.chunks_added else "error"
+        return DocumentResponse(status=status, chunks_added=ingester.chunks_added)
+    except Exception as e:
+        logger.error(f"Error adding documents: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 @app.post("/query", response_model=QueryResponse)
 async def query(request: QueryRequest):
     """
@@ -129,13 +171,48 @@ async def query(request: QueryRequest):
         if not request.question.strip():
             raise HTTPException(status_code=400, detail="Question cannot be empty")
         
-        result = rag_service.query(request.question)
+        result = await get_rag_service().query(request.question)
         return QueryResponse(**result)
     except Exception as e:
         logger.error(f"Error processing query: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.post("/query/stream")
+async def query_stream(request: QueryRequest):
+    """
+    Query the RAG system, streaming the answer as Server-Sent Events.
+    
+    The first event carries `source_documents`; each following event
+    carries a `token` of the answer.
+    
+    - **question**: The user's question
+    """
+    if not request.question.strip():
+        raise HTTPException(status_code=400, detail="Question cannot be empty")
+    
+    async def event_stream():
+        try:
+            async for event in get_rag_service().astream_query(request.question):
+                yield b"data: " + orjson.dumps(event) + b"\n\n"
+        except Exception as e:
+            logger.error(f"Error streaming query: {str(e)}")
+            yield b"data: " + orjson.dumps({"error": str(e)}) + b"\n\n"
+    
+    return StreamingResponse(event_stream(), media_type="text/event-stream")
+
+
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=settings.api_port)
+    # The semantic cache (and the local backend's index) live in process
+    # memory: extra workers would each keep their own copy, and an ingest
+    # would only clear the cache of the worker that handled it
+    uvicorn.run(
+        "app.main:app",
+        host="0.0.0.0",
+        port=settings.api_port,
+        loop="uvloop",
+        http="httptools",
+        workers=1,
+        backlog=2048
+    )
@@ -1,6 +1,66 @@
-from openai import OpenAI
-from typing import List, Dict, Any
+from openai import AsyncOpenAI, OpenAI
+from collections import OrderedDict
+from typing import AsyncIterator, List, Dict, Any, Optional, Tuple
 from app.config import settings
+import functools
+import httpx
+import re
+import threading
+import tiktoken
+
+# Number of single-text (query) embeddings kept in memory
+EMBEDDING_CACHE_SIZE = 4096
+
+# Limits OpenAI enforces on a single embeddings request
+EMBEDDING_MAX_INPUTS = 2048
+EMBEDDING_MAX_TOKENS = 300_000
+
+
+def normalize_text(text: str) -> str:
+    """
+    Normalize case and whitespace so trivially different strings share a cache entry.
+    
+    Shared by the embedding LRU and the semantic cache's exact-question probe.
+    Only used as a key; the original text is what gets embedded.
+    """
+    return re.sub(r"\s+", " ", text.strip().lower())
+
+
+@functools.cache
+def _get_encoding(model: str) -> tiktoken.Encoding:
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        return tiktoken.get_encoding("cl100k_base")
+
+
+def embedding_batches(texts: List[str]) -> List[slice]:
+    """
+    Split texts into batches that each fit in one embeddings request.
+    
+    Batches are capped by both input count and total tokens, so long or
+    token-dense chunks (code, CJK text) never push a request over the limit.
+    
+    Args:
+        texts: Texts to embed
+        
+    Returns:
+        Slices of texts, one per embeddings request
+    """
+    encoding = _get_encoding(settings.embedding_model)
+    batches = []
+    start = tokens = 0
+    for i, tokens_in_text in enumerate(map(len, encoding.encode_ordinary_batch(texts))):
+        if i > start and (
+            i - start >= EMBEDDING_MAX_INPUTS
+            or tokens + tokens_in_text > EMBEDDING_MAX_TOKENS
+        ):
+            batches.append(slice(start, i))
+            start, tokens = i, 0
+        tokens += tokens_in_text
+    if start < len(texts):
+        batches.append(slice(start, len(texts)))
+    return batches
 
 
 class OpenAIClient:
@@ -9,24 +69,63 @@ class OpenAIClient:
     def __init__(self):
         """Initialize OpenAI client."""
         self.client = OpenAI(api_key=settings.openai_api_key)
+        # Shared HTTP/2 connection pool so concurrent requests reuse warm
+        # connections instead of paying a TCP + TLS handshake each
+        self.http_client = httpx.AsyncClient(
+            http2=True,
+            limits=httpx.Limits(max_connections=100, max_keepalive_connections=50),
+            timeout=60.0
+        )
+        self.aclient = AsyncOpenAI(
+            api_key=settings.openai_api_key,
+            http_client=self.http_client
+        )
         self.model = settings.openai_model
         self.embedding_model = settings.embedding_model
+        # LRU cache of single-text embeddings shared by the sync and async
+        # paths (functools.lru_cache cannot wrap coroutines)
+        self._embedding_cache: "OrderedDict[str, Tuple[float, ...]]" = OrderedDict()
+        self._embedding_cache_lock = threading.Lock()
+    
+    def _get_cached_embedding(self, key: str) -> Optional[Tuple[float, ...]]:
+        with self._embedding_cache_lock:
+            embedding = self._embedding_cache.get(key)
+            if embedding is not None:
+                self._embedding_cache.move_to_end(key)
+            return embedding
+    
+    def _cache_embedding(self, key: str, embedding: List[float]):
+        with self._embedding_cache_lock:
+            self._embedding_cache[key] = tuple(embedding)
+            self._embedding_cache.move_to_end(key)
+            if len(self._embedding_cache) > EMBEDDING_CACHE_SIZE:
+                self._embedding_cache.popitem(last=False)
     
     def create_embedding(self, text: str) -> List[float]:
         """
         Create an embedding for the given text.
         
+        Repeated texts (ignoring case and whitespace) are served from an
+        in-memory LRU cache.
+        
         Args:
             text: The text to embed
             
         Returns:
             Embedding vector as a list of floats
         """
+        key = normalize_text(text)
+        embedding = self._get_cached_embedding(key)
+        if embedding is not None:
+            return list(embedding)
+        
         response = self.client.embeddings.create(
             model=self.embedding_model,
             input=text
         )
-        return response.data[0].embedding
+        embedding = response.data[0].embedding
+        self._cache_embedding(key, embedding)
+        return embedding
     
     def create_embeddings(self, texts: List[str]) -> List[List[float]]:
         """
@@ -66,7 +165,103 @@ class OpenAIClient:
         )
         return response.choices[0].message.content
 
+    
+    async def acreate_embedding(self, text: str) -> List[float]:
+        """
+        Create an embedding for the given text without blocking the event loop.
+        
+        Shares create_embedding's LRU cache.
+        
+        Args:
+            text: The text to embed
+            
+        Returns:
+            Embedding vector as a list of floats
+        """
+        key = normalize_text(text)
+        embedding = self._get_cached_embedding(key)
+        if embedding is not None:
+            return list(embedding)
+        
+        response = await self.aclient.embeddings.create(
+            model=self.embedding_model,
+            input=text
+        )
+        embedding = response.data[0].embedding
+        self._cache_embedding(key, embedding)
+        return embedding
+    
+    async def acreate_embeddings(self, texts: List[str]) -> List[List[float]]:
+        """
+        Create embeddings for multiple texts without blocking the event loop.
+        
+        Args:
+            texts: List of texts to embed
+            
+        Returns:
+            List of embedding vectors
+        """
+        response = await self.aclient.embeddings.create(
+            model=self.embedding_model,
+            input=texts
+        )
+        return [item.embedding for item in response.data]
+    
+    async def agenerate_response(
+        self, 
+        messages: List[Dict[str, str]], 
+        temperature: float = 0.7
+    ) -> str:
+        """
+        Generate a response using the chat completion API without blocking the event loop.
+        
+        Args:
+            messages: List of message dicts with 'role' and 'content'
+            temperature: Sampling temperature
+            
+        Returns:
+            Generated text response
+        """
+        response = await self.aclient.chat.completions.create(
+            model=self.model,
+            messages=messages,
+            temperature=temperature
+        )
+        return response.choices[0].message.content
+    
+    async def astream_response(
+        self, 
+        messages: List[Dict[str, str]], 
+        temperature: float = 0.7
+    ) -> AsyncIterator[str]:
+        """
+        Stream a response from the chat completion API token by token.
+        
+        Args:
+            messages: List of message dicts with 'role' and 'content'
+            temperature: Sampling temperature
+            
+        Yields:
+            Generated text fragments as they arrive
+        """
+        stream = await self.aclient.chat.completions.create(
+            model=self.model,
+            messages=messages,
+            temperature=temperature,
+            stream=True
+        )
+        async for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+    
+    async def aclose(self):
+        """Close the shared async HTTP connection pool."""
+        await self.http_client.aclose()
+
 
-# Global instance
-openai_client = OpenAIClient()
+# Global instance, created on first use so importing the app stays cheap
+@functools.cache
+def get_openai_client() -> OpenAIClient:
+    """Get the shared OpenAIClient instance."""
+    return OpenAIClient()
 
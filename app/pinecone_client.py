@@ -1,11 +1,18 @@
 from pinecone import Pinecone, ServerlessSpec
 from langchain_pinecone import PineconeVectorStore
 from langchain_openai import OpenAIEmbeddings
+from app.local_vector_store import LocalVectorStore
+from app.openai_client import get_openai_client
 from app.config import settings
+import functools
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Enough pooled connections for concurrent upsert batches to reuse warm
+# connections rather than opening new ones
+PINECONE_CONNECTION_POOL_MAXSIZE = 50
+
 
 class PineconeManager:
     """Manages Pinecone index initialization and operations."""
@@ -13,9 +20,11 @@ class PineconeManager:
     def __init__(self):
         self.pc = Pinecone(api_key=settings.pinecone_api_key)
         self.embeddings = OpenAIEmbeddings(
-            model="text-embedding-3-small",
-            openai_api_key=settings.openai_api_key
+            model=settings.embedding_model,
+            openai_api_key=settings.openai_api_key,
+            http_async_client=get_openai_client().http_client
         )
+        self.index = None
         self.vector_store = None
     
     def initialize_index(self):
@@ -26,7 +35,7 @@ class PineconeManager:
                 logger.info(f"Creating index: {settings.pinecone_index_name}")
                 self.pc.create_index(
                     name=settings.pinecone_index_name,
-                    dimension=1536,  # text-embedding-3-small dimension
+                    dimension=settings.embedding_dimension,
                     metric="cosine",
                     spec=ServerlessSpec(
                         cloud="aws",
@@ -37,11 +46,14 @@ class PineconeManager:
                 logger.info(f"Index {settings.pinecone_index_name} already exists")
             
             # Connect to the index
-            index = self.pc.Index(settings.pinecone_index_name)
+            self.index = self.pc.Index(
+                settings.pinecone_index_name,
+                connection_pool_maxsize=PINECONE_CONNECTION_POOL_MAXSIZE
+            )
             
             # Initialize vector store
             self.vector_store = PineconeVectorStore(
-                index=index,
+                index=self.index,
                 embedding=self.embeddings
             )
             
@@ -52,12 +64,30 @@ class PineconeManager:
             logger.error(f"Error initializing Pinecone: {str(e)}")
             raise
     
+    def initialize_local(self):
+        """Initialize the in-process FAISS vector store."""
+        self.vector_store = LocalVectorStore()
+        self.vector_store.load()
+        logger.info("Local vector store initialized successfully")
+        return True
+    
     def get_vector_store(self):
         """Get the vector store instance."""
         if self.vector_store is None:
-            self.initialize_index()
+            if settings.backend == "local":
+                self.initialize_local()
+            else:
+                self.initialize_index()
         return self.vector_store
+    
+    def shutdown(self):
+        """Persist the local vector store, if one is in use."""
+        if isinstance(self.vector_store, LocalVectorStore):
+            self.vector_store.save()
 
 
-# Global instance
-pinecone_manager = PineconeManager()
+# Global instance, created on first use so importing the app stays cheap
+@functools.cache
+def get_pinecone_manager() -> PineconeManager:
+    """Get the shared PineconeManager instance."""
+    return PineconeManager()
@@ -1,34 +1,58 @@
-from langchain_openai import ChatOpenAI
-from langchain_core.prompts import ChatPromptTemplate
-from langchain_core.output_parsers import StrOutputParser
-from app.pinecone_client import pinecone_manager
+from app.pinecone_client import get_pinecone_manager
+from app.local_vector_store import LocalVectorStore
+from app.openai_client import embedding_batches, get_openai_client
 from app.document_processor import DocumentProcessor
+from app.semantic_cache import SemanticCache
+from app.embedding_cache import EmbeddingCache
 from app.config import settings
+from contextlib import asynccontextmanager
+import asyncio
+import functools
 import logging
+import uuid
 
 logger = logging.getLogger(__name__)
 
+# Pinecone recommends upserting in batches of around 100 vectors
+UPSERT_BATCH_SIZE = 100
+
+SNIPPET_LENGTH = 200
+
+
+def _snippet(text: str) -> str:
+    """Truncate text for source previews, marking it only if it was cut."""
+    return text if len(text) <= SNIPPET_LENGTH else f"{text[:SNIPPET_LENGTH]}..."
+
+
+def _build_messages(context: str, question: str):
+    """Build the chat messages for answering a question from retrieved context."""
+    return [{
+        "role": "user",
+        "content": f"""Use the following pieces of context to answer the question at the end. 
+            If you don't know the answer based on the context, just say that you don't know, don't try to make up an answer.
+            
+            Context: {context}
+            
+            Question: {question}
+            
+            Answer:"""
+    }]
+
 
 class RAGService:
     """Handles RAG operations: document ingestion and querying."""
     
     def __init__(self):
         self.vector_store = None
-        self.document_processor = DocumentProcessor()
-        self.llm = ChatOpenAI(
-            model="gpt-3.5-turbo",
-            temperature=0,
-            openai_api_key=settings.openai_api_key
-        )
-        self.retriever = None
+        self.document_processor = DocumentProcessor(by_tokens=settings.chunk_by_tokens)
+        self.cache = SemanticCache()
+        self.embedding_cache = EmbeddingCache()
+        self._background_tasks = set()  # Strong references until each task finishes
     
     def initialize(self):
         """Initialize the RAG service with vector store."""
         try:
-            self.vector_store = pinecone_manager.get_vector_store()
-            
-            # Create retriever
-            self.retriever = self.vector_store.as_retriever(search_kwargs={"k": 3})
+            self.vector_store = get_pinecone_manager().get_vector_store()
             
             logger.info("RAG service initialized successfully")
             return True
@@ -37,37 +61,28 @@ class RAGService:
             logger.error(f"Error initializing RAG service: {str(e)}")
             raise
     
-    def add_documents(self, text: str, metadata: dict = None):
+    async def aadd_documents(self, text: str, metadata: dict = None):
         """
-        Add documents to the vector store.
+        Add documents to the vector store, embedding and upserting concurrently.
         
         Args:
             text: The text content to add
             metadata: Optional metadata dictionary
         """
         try:
-            if self.vector_store is None:
-                self.vector_store = pinecone_manager.get_vector_store()
-            
-            # Process text into chunks
-            documents = self.document_processor.process_text(text, metadata or {})
+            # Process text into chunks in a worker thread to keep the event loop free
+            documents = await asyncio.to_thread(
+                self.document_processor.process_text,
+                text,
+                metadata or {}
+            )
             
             if not documents or len(documents) == 0:
                 logger.warning("No documents to add after processing")
                 return {"status": "error", "chunks_added": 0, "message": "No valid text to process"}
             
-            # Add to vector store
-            logger.info(f"Adding {len(documents)} document chunks to Pinecone...")
-            doc_ids = self.vector_store.add_documents(documents)
-            
-            # Small delay to ensure Pinecone has indexed the documents
-            import time
-            time.sleep(2)
-            
-            # Re-initialize retriever after adding documents to ensure it's up to date
-            if self.vector_store:
-                self.retriever = self.vector_store.as_retriever(search_kwargs={"k": 3})
-                logger.info("Retriever re-initialized after adding documents")
+            await self._aingest_documents(documents)
+            await self._arefresh_after_ingest()
             
             logger.info(f"Successfully added {len(documents)} document chunks to vector store")
             return {"status": "success", "chunks_added": len(documents)}
@@ -76,15 +91,119 @@ class RAGService:
             logger.error(f"Error adding documents: {str(e)}")
             raise
     
+    @asynccontextmanager
+    async def buffered_ingestion(self, flush_at: int = UPSERT_BATCH_SIZE):
+        """
+        Ingest many documents with as few embedding and upsert calls as possible.
+        
+        Chunks are buffered until flush_at of them have accumulated, then
+        embedded and upserted as one batch. Remaining chunks are flushed on exit.
+        
+        Args:
+            flush_at: Number of buffered chunks that triggers a flush
+            
+        Yields:
+            BufferedIngester to pass documents to
+        """
+        ingester = BufferedIngester(self, flush_at)
+        try:
+            yield ingester
+            await ingester.flush()
+        finally:
+            if ingester.chunks_added:
+                await self._arefresh_after_ingest()
+    
+    async def _aingest_documents(self, documents):
+        """Embed document chunks and add them to the vector store."""
+        if self.vector_store is None:
+            self.vector_store = get_pinecone_manager().get_vector_store()
+        
+        embeddings = await self._aembed_documents(documents)
+        
+        if isinstance(self.vector_store, LocalVectorStore):
+            self.vector_store.add_embeddings(documents, embeddings)
+        else:
+            await self._aupsert(documents, embeddings)
+    
+    async def _arefresh_after_ingest(self):
+        """Make newly ingested documents visible to queries."""
+        if not isinstance(self.vector_store, LocalVectorStore):
+            # Small delay to ensure Pinecone has indexed the documents
+            await asyncio.sleep(2)
+        
+        # Cached answers may be stale now that the knowledge base changed
+        self.cache.clear()
+    
+    async def _aembed_documents(self, documents):
+        """
+        Embed document chunks, reusing cached embeddings for unchanged content.
+        
+        Args:
+            documents: Document chunks to embed
+            
+        Returns:
+            Embedding for each document, in order
+        """
+        hashes = [EmbeddingCache.content_hash(doc.page_content) for doc in documents]
+        # SQLite I/O runs in a worker thread to keep the event loop free
+        embeddings = await asyncio.to_thread(self.embedding_cache.get_many, hashes)
+        
+        # Deduplicate misses, then sort by length so each embedding batch
+        # holds similarly sized chunks
+        misses = {}
+        for content_hash, doc in zip(hashes, documents):
+            if content_hash not in embeddings:
+                misses[content_hash] = doc.page_content
+        misses = sorted(misses.items(), key=lambda item: len(item[1]), reverse=True)
+        logger.info(f"Embedding {len(misses)} of {len(documents)} document chunks ({len(documents) - len(misses)} cached)...")
+        
+        if misses:
+            # Embed all batches concurrently; tokenizing for the batch
+            # budget runs in a worker thread
+            texts = [text for _, text in misses]
+            batches = await asyncio.to_thread(embedding_batches, texts)
+            batch_embeddings = await asyncio.gather(*[
+                get_openai_client().acreate_embeddings(texts[batch])
+                for batch in batches
+            ])
+            new_embeddings = dict(zip(
+                [content_hash for content_hash, _ in misses],
+                [embedding for batch_result in batch_embeddings for embedding in batch_result]
+            ))
+            await asyncio.to_thread(self.embedding_cache.put_many, new_embeddings)
+            embeddings.update(new_embeddings)
+        
+        return [embeddings[content_hash] for content_hash in hashes]
+    
+    async def _aupsert(self, documents, embeddings):
+        """Upsert embedded documents to Pinecone in concurrent batches."""
+        # Store the chunk text under the same "text" key PineconeVectorStore
+        # reads back on retrieval
+        logger.info(f"Adding {len(documents)} document chunks to Pinecone...")
+        vectors = [
+            (str(uuid.uuid4()), embedding, {**doc.metadata, "text": doc.page_content})
+            for doc, embedding in zip(documents, embeddings)
+        ]
+        await asyncio.gather(*[
+            asyncio.to_thread(
+                get_pinecone_manager().index.upsert,
+                vectors=vectors[i:i + UPSERT_BATCH_SIZE]
+            )
+            for i in range(0, len(vectors), UPSERT_BATCH_SIZE)
+        ])
+    
     def get_document_count(self):
         """Get the approximate number of documents in the vector store."""
         try:
             if self.vector_store is None:
-                self.vector_store = pinecone_manager.get_vector_store()
+                self.vector_store = get_pinecone_manager().get_vector_store()
+            
+            if isinstance(self.vector_store, LocalVectorStore):
+                return len(self.vector_store.docs)
             
             # Get index stats using the Pinecone client from manager
             from app.config import settings
-            pc = pinecone_manager.pc
+            pc = get_pinecone_manager().pc
             index = pc.Index(settings.pinecone_index_name)
             stats = index.describe_index_stats()
             total_vectors = stats.get('total_vector_count', 0)
@@ -93,7 +212,7 @@ class RAGService:
             logger.error(f"Error getting document count: {str(e)}")
             return 0
     
-    def query(self, question: str):
+    async def query(self, question: str):
         """
         Query the RAG system.
         
@@ -104,71 +223,244 @@ class RAGService:
             Dictionary with answer and source documents
         """
         try:
-            if self.retriever is None:
-                self.initialize()
+            response, retrieved_docs, question_embedding = await self._aretrieve(question)
+            if response is not None:
+                return response
             
-            # Check if we have any documents in the index first
-            doc_count = self.get_document_count()
-            logger.info(f"Total vectors in index: {doc_count}")
+            context = "\n\n".join(doc.page_content for doc in retrieved_docs)
             
-            if doc_count == 0:
-                logger.warning("No documents found in Pinecone index")
-                return {
-                    "answer": "I don't have any documents in my knowledge base yet. Please upload some documents first using the 'Upload Documents' tab.",
-                    "source_documents": []
-                }
+            # Get response from LLM
+            answer = await get_openai_client().agenerate_response(
+                _build_messages(context, question),
+                temperature=0
+            )
             
-            # Get retrieved documents for source tracking
-            logger.info(f"Searching for documents with query: {question}")
-            retrieved_docs = self.retriever.invoke(question)
-            logger.info(f"Retrieved {len(retrieved_docs)} documents")
+            logger.info(f"Retrieved {len(retrieved_docs)} documents for query")
             
-            # Check if we have any documents
-            if not retrieved_docs or len(retrieved_docs) == 0:
-                logger.warning(f"No documents retrieved for query: {question}. Total vectors in index: {doc_count}")
-                return {
-                    "answer": f"I couldn't find relevant information for your question. I have {doc_count} document(s) in my knowledge base. Try rephrasing your question or uploading more relevant documents.",
-                    "source_documents": []
-                }
+            source_documents = self._format_sources(retrieved_docs)
+            self._cache_answer_in_background(question, question_embedding, retrieved_docs, answer, source_documents)
             
-            # Format documents for context
-            def format_docs(docs):
-                return "\n\n".join(doc.page_content for doc in docs)
+            return {
+                "answer": answer,
+                "source_documents": source_documents
+            }
             
-            context = format_docs(retrieved_docs)
+        except Exception as e:
+            logger.error(f"Error querying RAG system: {str(e)}")
+            raise
+    
+    async def astream_query(self, question: str):
+        """
+        Query the RAG system, streaming the answer as it is generated.
+        
+        Args:
+            question: The user's question
             
-            # Create prompt with context
-            prompt = ChatPromptTemplate.from_template("""Use the following pieces of context to answer the question at the end. 
-            If you don't know the answer based on the context, just say that you don't know, don't try to make up an answer.
+        Yields:
+            A {"source_documents": [...]} event once retrieval completes,
+            followed by {"token": str} events for the answer
+        """
+        try:
+            response, retrieved_docs, question_embedding = await self._aretrieve(question)
+            if response is not None:
+                yield {"source_documents": response["source_documents"]}
+                yield {"token": response["answer"]}
+                return
             
-            Context: {context}
+            source_documents = self._format_sources(retrieved_docs)
+            yield {"source_documents": source_documents}
             
-            Question: {question}
+            context = "\n\n".join(doc.page_content for doc in retrieved_docs)
             
-            Answer:""")
+            tokens = []
+            async for token in get_openai_client().astream_response(
+                _build_messages(context, question),
+                temperature=0
+            ):
+                tokens.append(token)
+                yield {"token": token}
             
-            # Get response from LLM
-            chain = prompt | self.llm | StrOutputParser()
-            answer = chain.invoke({"context": context, "question": question})
+            self._cache_answer_in_background(
+                question,
+                question_embedding,
+                retrieved_docs,
+                "".join(tokens),
+                source_documents
+            )
             
-            logger.info(f"Retrieved {len(retrieved_docs)} documents for query")
+        except Exception as e:
+            logger.error(f"Error streaming RAG query: {str(e)}")
+            raise
+    
+    async def _aretrieve(self, question: str):
+        """
+        Retrieve context for a question.
+        
+        Args:
+            question: The user's question
             
+        Returns:
+            Tuple of (response, retrieved_docs, question_embedding). response
+            is a complete answer dict when the question can be answered without
+            the LLM (cache hit or nothing to retrieve), otherwise None.
+        """
+        if self.vector_store is None:
+            self.initialize()
+        
+        # Serve repeated questions from the cache before paying for an
+        # embedding, then semantically equivalent ones
+        cached = self.cache.probe_text(question)
+        if cached is None:
+            question_embedding = await get_openai_client().acreate_embedding(question)
+            cached = self.cache.lookup(question_embedding)
+        if cached is not None:
             return {
-                "answer": answer,
-                "source_documents": [
-                    {
-                        "content": doc.page_content[:200] + "...",
-                        "metadata": doc.metadata
-                    }
-                    for doc in retrieved_docs
-                ]
-            }
+                "answer": cached.answer,
+                "source_documents": cached.source_documents
+            }, None, None
+        
+        # Retrieve once, reusing the question embedding rather than letting the
+        # vector store embed it again. The index is only counted when nothing comes
+        # back, to pick the right message, saving a stats round trip per query.
+        # The sync search runs in a thread so Pinecone queries go through the
+        # pooled index client rather than a fresh asyncio session per call.
+        logger.info(f"Searching for documents with query: {question}")
+        retrieved_docs = await asyncio.to_thread(
+            self.vector_store.similarity_search_by_vector,
+            question_embedding,
+            3
+        )
+        logger.info(f"Retrieved {len(retrieved_docs)} documents")
+        
+        if not retrieved_docs or len(retrieved_docs) == 0:
+            doc_count = await asyncio.to_thread(self.get_document_count)
+            logger.info(f"Total vectors in index: {doc_count}")
+            
+            if doc_count == 0:
+                logger.warning("No documents found in Pinecone index")
+                return {
+                    "answer": "I don't have any documents in my knowledge base yet. Please upload some documents first using the 'Upload Documents' tab.",
+                    "source_documents": []
+                }, None, None
             
+            logger.warning(f"No documents retrieved for query: {question}. Total vectors in index: {doc_count}")
+            return {
+                "answer": f"I couldn't find relevant information for your question. I have {doc_count} document(s) in my knowledge base. Try rephrasing your question or uploading more relevant documents.",
+                "source_documents": []
+            }, None, None
+        
+        return None, retrieved_docs, question_embedding
+    
+    def _format_sources(self, retrieved_docs):
+        """Format retrieved documents for the response."""
+        return [
+            {
+                "content": _snippet(doc.page_content),
+                "metadata": doc.metadata
+            }
+            for doc in retrieved_docs
+        ]
+    
+    def _cache_answer_in_background(self, *args):
+        """Cache an answer without holding up the response it was generated for."""
+        task = asyncio.create_task(self._acache_answer(*args))
+        self._background_tasks.add(task)
+        task.add_done_callback(self._background_tasks.discard)
+    
+    async def _acache_answer(
+        self,
+        question: str,
+        question_embedding,
+        retrieved_docs,
+        answer: str,
+        source_documents
+    ):
+        """Index an answer under its source chunks for future questions."""
+        try:
+            # Ingested chunks are normally already in the embedding cache
+            document_embeddings = await self._aembed_documents(retrieved_docs)
+            self.cache.add(document_embeddings, answer, source_documents, question_embedding, question)
         except Exception as e:
-            logger.error(f"Error querying RAG system: {str(e)}")
-            raise
+            logger.error(f"Error caching answer: {str(e)}")
+
+
+class BufferedIngester:
+    """Buffers document chunks for RAGService.buffered_ingestion."""
+    
+    def __init__(self, rag_service: RAGService, flush_at: int):
+        self._rag_service = rag_service
+        self.flush_at = flush_at
+        self._buf = []
+        self.chunks_added = 0
+    
+    async def try_ingest(self, text: str, metadata: dict = None) -> int:
+        """
+        Chunk a document into the buffer, flushing each full batch.
+        
+        Args:
+            text: The text content to add
+            metadata: Optional metadata dictionary
+            
+        Returns:
+            Number of chunks the text was split into
+        """
+        documents = await asyncio.to_thread(
+            self._rag_service.document_processor.process_text,
+            text,
+            metadata or {}
+        )
+        self._buf.extend(documents)
+        await self._flush_full()
+        return len(documents)
+    
+    async def try_ingest_many(self, texts: list, metadatas: list = None) -> int:
+        """
+        Chunk many documents into the buffer at once, flushing each full batch.
+        
+        Args:
+            texts: The text contents to add
+            metadatas: Optional metadata dictionary for each text
+            
+        Returns:
+            Number of chunks the texts were split into
+        """
+        documents = await asyncio.to_thread(
+            self._rag_service.document_processor.process_documents,
+            texts,
+            metadatas
+        )
+        self._buf.extend(documents)
+        await self._flush_full()
+        return len(documents)
+    
+    async def flush(self):
+        """Embed and upsert every buffered chunk."""
+        await self._flush_full()
+        if self._buf:
+            documents, self._buf = self._buf, []
+            await self._aingest(documents)
+    
+    async def _flush_full(self):
+        """
+        Embed and upsert flush_at chunks at a time while the buffer holds that many.
+        
+        Batches go out one after another, so a large request never fans out
+        into more concurrent embedding and upsert calls than one batch needs.
+        """
+        while len(self._buf) >= self.flush_at:
+            documents = self._buf[:self.flush_at]
+            del self._buf[:self.flush_at]
+            await self._aingest(documents)
+    
+    async def _aingest(self, documents):
+        await self._rag_service._aingest_documents(documents)
+        self.chunks_added += len(documents)
+        logger.info(f"Flushed {len(documents)} buffered document chunks to vector store")
 
 
-# Global instance
-rag_service = RAGService()
+# Global instance, created on first use so importing the app stays cheap
+@functools.cache
+def get_rag_service() -> RAGService:
+    """Get the shared RAGService instance."""
+    return RAGService()
 
@@ -0,0 +1,296 @@
+import faiss
+import heapq
+import numpy as np
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+from app.config import settings
+from app.openai_client import normalize_text
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Once enough vectors are cached, a PCA projection is fitted on a sample of
+# them in a background thread; probes then pick candidates from a PCA-reduced
+# copy of the index and score them at full dimension.
+PCA_DIMENSION = 256
+PCA_MIN_TRAINING_VECTORS = 2000
+PCA_TRAINING_SAMPLE = 1000
+PCA_CANDIDATE_FACTOR = 4  # Reduced-index candidates fetched per requested result
+
+
+@dataclass
+class CacheEntry:
+    """A cached answer together with the sources it was generated from."""
+    answer: str
+    source_documents: List[dict]
+    ts: float
+    last_access: float
+    question_embedding: np.ndarray  # L2-normalized
+    question: Optional[str] = None
+
+
+class SemanticCache:
+    """
+    In-memory semantic cache of RAG answers.
+
+    Answers are indexed by the embeddings of the document chunks they were
+    generated from. A new question is answered from the cache, without hitting
+    Pinecone or the LLM, only if it lands close to those chunks and is also a
+    near-paraphrase of the question that produced the answer.
+    """
+
+    def __init__(
+        self,
+        dimension: int = settings.embedding_dimension,
+        threshold: float = settings.semantic_cache_threshold,
+        question_threshold: float = settings.semantic_cache_question_threshold,
+        ttl: float = settings.semantic_cache_ttl,
+        max_size: int = settings.semantic_cache_max_size
+    ):
+        self.dimension = dimension
+        self.threshold = threshold
+        self.question_threshold = question_threshold
+        self.ttl = ttl
+        self.max_size = max_size
+        # fp16 scalar quantization halves memory per vector; the cosine error
+        # is far below the hit threshold's margin
+        self.index = faiss.IndexIDMap2(faiss.IndexScalarQuantizer(
+            dimension,
+            faiss.ScalarQuantizer.QT_fp16,
+            faiss.METRIC_INNER_PRODUCT
+        ))
+        self.entries: Dict[int, CacheEntry] = {}
+        self._vector_ids: Dict[int, List[int]] = {}  # entry id -> faiss ids
+        self._vector_owner: Dict[int, int] = {}  # faiss id -> entry id
+        self._questions: Dict[str, int] = {}  # normalized question -> entry id
+        self._pca = None
+        self._reduced_index = None
+        self._pca_fitting = False
+        self._generation = 0  # Bumped on clear() to discard in-flight PCA fits
+        self._next_entry_id = 0
+        self._next_vector_id = 0
+        self._lock = threading.Lock()
+
+    def _normalize(self, embeddings: List[List[float]]) -> np.ndarray:
+        vectors = np.asarray(embeddings, dtype=np.float32).reshape(-1, self.dimension)
+        faiss.normalize_L2(vectors)
+        return vectors
+
+    def probe_text(self, question: str) -> Optional[CacheEntry]:
+        """
+        Look up a cached answer for the exact same question, without embedding it.
+
+        Args:
+            question: The user's question
+
+        Returns:
+            The matching CacheEntry, or None on a miss
+        """
+        with self._lock:
+            entry_id = self._questions.get(normalize_text(question))
+            if entry_id is None:
+                return None
+            entry = self._touch(entry_id, time.time())
+            if entry is not None:
+                logger.info("Semantic cache hit (exact question)")
+            return entry
+
+    def lookup(self, query_embedding: List[float], k: int = 10) -> Optional[CacheEntry]:
+        """
+        Look up a cached answer for a query embedding.
+
+        Args:
+            query_embedding: Embedding of the user's question
+            k: Number of nearest cached vectors to inspect
+
+        Returns:
+            The matching CacheEntry, or None on a miss
+        """
+        with self._lock:
+            if self.index.ntotal == 0:
+                return None
+
+            query = self._normalize([query_embedding])
+            if self._pca is not None:
+                candidates = self._search_reduced(query, k)
+            else:
+                scores, ids = self.index.search(query, k)
+                candidates = zip(scores[0], ids[0])
+
+            now = time.time()
+            checked = set()
+            for score, vector_id in candidates:
+                if vector_id == -1 or score < self.threshold:
+                    break
+                entry_id = self._vector_owner.get(int(vector_id))
+                if entry_id is None or entry_id in checked:
+                    continue  # Expired or already checked earlier in this loop
+                checked.add(entry_id)
+                # Sharing source chunks is not enough: the question itself must
+                # be a near-paraphrase of the one the answer was generated for
+                question_score = float(self.entries[entry_id].question_embedding @ query[0])
+                if question_score < self.question_threshold:
+                    continue
+                entry = self._touch(entry_id, now)
+                if entry is None:
+                    continue
+                logger.info(f"Semantic cache hit (score={score:.3f}, question score={question_score:.3f})")
+                return entry
+            return None
+
+    def add(
+        self,
+        document_embeddings: List[List[float]],
+        answer: str,
+        source_documents: List[dict],
+        question_embedding: List[float],
+        question: Optional[str] = None
+    ):
+        """
+        Cache an answer under the embeddings of its source document chunks.
+
+        Args:
+            document_embeddings: Embeddings of the retrieved document chunks
+            answer: The generated answer
+            source_documents: The source documents returned with the answer
+            question_embedding: Embedding of the question that was answered
+            question: The question that was answered, for exact-match lookups
+        """
+        if not document_embeddings:
+            return
+
+        with self._lock:
+            vectors = self._normalize(document_embeddings)
+            vector_ids = np.arange(
+                self._next_vector_id,
+                self._next_vector_id + len(vectors),
+                dtype=np.int64
+            )
+            self._next_vector_id += len(vectors)
+
+            entry_id = self._next_entry_id
+            self._next_entry_id += 1
+            now = time.time()
+            if question is not None:
+                question = normalize_text(question)
+                self._questions[question] = entry_id
+            self.entries[entry_id] = CacheEntry(
+                answer,
+                source_documents,
+                now,
+                now,
+                self._normalize([question_embedding])[0],
+                question
+            )
+            self._vector_ids[entry_id] = vector_ids.tolist()
+            for vector_id in self._vector_ids[entry_id]:
+                self._vector_owner[vector_id] = entry_id
+            self.index.add_with_ids(vectors, vector_ids)
+            if self._pca is not None:
+                self._add_reduced(vectors, vector_ids)
+            elif not self._pca_fitting and self.index.ntotal >= PCA_MIN_TRAINING_VECTORS:
+                self._start_pca_fit()
+
+            self._evict()
+
+    def clear(self):
+        """Drop every cached answer."""
+        with self._lock:
+            self.index.reset()
+            self.entries.clear()
+            self._vector_ids.clear()
+            self._vector_owner.clear()
+            self._questions.clear()
+            self._pca = None
+            self._reduced_index = None
+            self._generation += 1
+
+    def _touch(self, entry_id: int, now: float) -> Optional[CacheEntry]:
+        """Mark an entry as used, or drop it and return None if it has expired."""
+        entry = self.entries[entry_id]
+        if now - entry.ts > self.ttl:
+            self._remove(entry_id)
+            return None
+        entry.last_access = now
+        return entry
+
+    def _search_reduced(self, query: np.ndarray, k: int) -> List[tuple]:
+        """Pick candidates from the PCA-reduced index, then score them at full dimension."""
+        reduced = self._pca.apply_py(query)
+        faiss.normalize_L2(reduced)
+        _, ids = self._reduced_index.search(reduced, k * PCA_CANDIDATE_FACTOR)
+        # PCA centers the vectors, so reduced-space cosines are on a different
+        # scale from the full-dimension ones the threshold is set for
+        candidates = [
+            (float(self.index.reconstruct(int(vector_id)) @ query[0]), vector_id)
+            for vector_id in ids[0]
+            if vector_id != -1
+        ]
+        candidates.sort(key=lambda candidate: candidate[0], reverse=True)
+        return candidates[:k]
+
+    def _start_pca_fit(self):
+        """Fit the PCA projection in a background thread; lookups stay full-dimension until it is ready."""
+        vectors = self.index.index.reconstruct_n(0, self.index.ntotal)
+        sample_size = min(PCA_TRAINING_SAMPLE, len(vectors))
+        sample = vectors[np.random.default_rng().choice(len(vectors), sample_size, replace=False)]
+        self._pca_fitting = True
+        threading.Thread(
+            target=self._fit_pca,
+            args=(sample, self._generation),
+            daemon=True
+        ).start()
+
+    def _fit_pca(self, sample: np.ndarray, generation: int):
+        """Train the PCA projection on a sample, then build the reduced index."""
+        pca = faiss.PCAMatrix(self.dimension, PCA_DIMENSION)
+        try:
+            pca.train(sample)
+        except Exception as e:
+            logger.error(f"Error fitting semantic cache PCA: {str(e)}")
+            with self._lock:
+                self._pca_fitting = False
+            return
+
+        with self._lock:
+            self._pca_fitting = False
+            if generation != self._generation:
+                return  # The cache was cleared while fitting
+            # Project every vector cached by now, including those added during the fit
+            vectors = self.index.index.reconstruct_n(0, self.index.ntotal)
+            vector_ids = faiss.vector_to_array(self.index.id_map)
+            self._pca = pca
+            self._reduced_index = faiss.IndexIDMap2(faiss.IndexFlatIP(PCA_DIMENSION))
+            self._add_reduced(vectors, vector_ids)
+        logger.info(f"Fitted semantic cache PCA on {len(sample)} sampled vectors")
+
+    def _add_reduced(self, vectors: np.ndarray, vector_ids: np.ndarray):
+        reduced = self._pca.apply_py(vectors)
+        faiss.normalize_L2(reduced)
+        self._reduced_index.add_with_ids(reduced, vector_ids)
+
+    def _evict(self):
+        """Evict least recently used entries once the cache is over capacity."""
+        overflow = len(self.entries) - self.max_size
+        if overflow <= 0:
+            return
+        stale = heapq.nsmallest(
+            overflow,
+            self.entries.items(),
+            key=lambda item: item[1].last_access
+        )
+        for entry_id, _ in stale:
+            self._remove(entry_id)
+
+    def _remove(self, entry_id: int):
+        vector_ids = self._vector_ids.pop(entry_id)
+        for vector_id in vector_ids:
+            del self._vector_owner[vector_id]
+        self.index.remove_ids(np.asarray(vector_ids, dtype=np.int64))
+        if self._reduced_index is not None:
+            self._reduced_index.remove_ids(np.asarray(vector_ids, dtype=np.int64))
+        entry = self.entries.pop(entry_id)
+        if entry.question is not None and self._questions.get(entry.question) == entry_id:
+            del self._questions[entry.question]